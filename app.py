@@ -1,9 +1,24 @@
 import datetime
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    from bs4 import BeautifulSoup, SoupStrainer
+    HAS_SELECTOLAX = False
+    # Only materialize the tags the extraction waterfall actually inspects.
+    # Note the strainer keeps the full subtree of each matched tag, so
+    # noscript/iframe nested inside kept content still get built and must
+    # be decomposed before text extraction (script/style stay out of the
+    # output only because get_text() skips Script/Stylesheet strings).
+    CONTENT_STRAINER = SoupStrainer(['article', 'main', 'section', 'div', 'p'])
 import google.generativeai as genai
 from supabase import create_client, Client
 from urllib.parse import urlparse
@@ -11,19 +26,34 @@ from urllib.robotparser import RobotFileParser
 import os
 import re
 import json
+import hashlib
 import time
-from datetime import datetime, timedelta
-from collections import defaultdict
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Load environment variables
 load_dotenv()
 
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson's C encoder/decoder"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)  # jsonify/get_json now go through orjson
 CORS(app)  # Enable CORS for React frontend
 
-# Configure Gemini Pro
-genai.configure(api_key=os.environ['GOOGLE_API_KEY'])
+# Configure Gemini Pro. REST transport, not the default gRPC: gRPC blocks
+# in native code that never yields to gevent's hub (and is unsupported
+# under gevent monkey-patching), so with gevent workers every generate
+# call would stall the whole worker. REST rides monkey-patched sockets.
+genai.configure(api_key=os.environ['GOOGLE_API_KEY'], transport='rest')
 model = genai.GenerativeModel('gemini-2.0-flash')
 
 # Initialize Supabase with error handling
@@ -41,6 +71,33 @@ except Exception as e:
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 HEADERS = {'User-Agent': USER_AGENT}
 
+# Largest HTML body we will download/decode/parse per scrape
+MAX_HTML_BYTES = 2_000_000
+
+# Character budget for the text excerpt sent to Gemini; extraction stops
+# collecting once this much text is in hand
+MAX_TEXT_CHARS = 12000
+
+# Pre-compiled regexes used on every request
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+WS_RE = re.compile(r'\s+')
+NL_RE = re.compile(r'\n+')
+
+# Decoder used to pull the first JSON object out of Gemini responses
+JSON_DECODER = json.JSONDecoder()
+
+# Shared session so robots.txt, permission probes and the final GET reuse
+# keep-alive connections instead of paying a TCP+TLS handshake per call
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.2)
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
 # # Add error handlers
 # @app.errorhandler(404)
 # def not_found_error(error):
@@ -51,38 +108,63 @@ HEADERS = {'User-Agent': USER_AGENT}
 #     return jsonify({"error": "Internal server error"}), 500
 
 
-# Rate limiting storage
-rate_limits = defaultdict(lambda: {'count': 0, 'reset_time': datetime.now()})
+# Rate limiting: token bucket per domain, storing just (tokens, last_refill).
+# Refilling at 1 token/second with a burst of 60 matches the old
+# 60-requests-per-minute limit without the fixed-window boundary spike.
+RATE_LIMIT_RATE = 60 / 60.0  # tokens per second
+RATE_LIMIT_BURST = 60
+rate_limit_buckets = {}
+rate_limit_lock = threading.Lock()
 
-def check_rate_limit(url):
+def check_rate_limit(domain):
     """Check if domain has exceeded rate limit"""
-    domain = urlparse(url).netloc
-    now = datetime.now()
-    
-    # Reset counter if time window has passed
-    if now - rate_limits[domain]['reset_time'] > timedelta(minutes=1):
-        rate_limits[domain] = {'count': 0, 'reset_time': now}
-    
-    # Check and increment counter
-    rate_limits[domain]['count'] += 1
-    return rate_limits[domain]['count'] <= 60  # 60 requests per minute per domain
+    now = time.monotonic()
+
+    with rate_limit_lock:
+        tokens, last_refill = rate_limit_buckets.get(domain, (RATE_LIMIT_BURST, now))
+        tokens = min(RATE_LIMIT_BURST, tokens + (now - last_refill) * RATE_LIMIT_RATE)
+        if tokens < 1:
+            rate_limit_buckets[domain] = (tokens, now)
+            return False
+        rate_limit_buckets[domain] = (tokens - 1, now)
+        return True
+
+def try_head(url, timeout):
+    """HEAD a URL, returning None instead of raising on network errors"""
+    try:
+        return SESSION.head(url, timeout=timeout)
+    except requests.exceptions.RequestException:
+        return None
 
 def check_site_permissions(url):
     """Check all site permissions and requirements before scraping"""
     try:
         parsed_url = urlparse(url)
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        tos_paths = ['/terms', '/tos', '/terms-of-service', '/terms-and-conditions']
 
-        # 1. Check robots.txt
-        robots_allowed = check_robots_permission(url)
-        if not robots_allowed:
-            return False, "Blocked by robots.txt"
+        # The robots.txt fetch, target HEAD and TOS probes are all
+        # independent IO against the same host - fan them out at once so
+        # wall time is the slowest single roundtrip instead of the sum.
+        # All probes share SESSION's keep-alive connection pool.
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            robots_future = executor.submit(check_robots_permission, url, parsed_url)
+            head_future = executor.submit(SESSION.head, url, timeout=5)
+            tos_futures = {
+                executor.submit(try_head, base_url + path, 3): path
+                for path in tos_paths
+            }
 
-        # 2. Check rate limiting headers
-        try:
-            head_response = requests.head(url, headers=HEADERS, timeout=5)
-            
-            # Check for rate limit headers
+            # 1. Check robots.txt
+            if not robots_future.result():
+                return False, "Blocked by robots.txt"
+
+            try:
+                head_response = head_future.result()
+            except requests.exceptions.RequestException as e:
+                return False, f"Network error during permission check: {str(e)}"
+
+            # 2. Check rate limiting headers
             if 'X-RateLimit-Remaining' in head_response.headers:
                 if int(head_response.headers['X-RateLimit-Remaining']) <= 0:
                     return False, "Rate limit exceeded"
@@ -100,134 +182,260 @@ def check_site_permissions(url):
             if 'text/html' not in content_type:
                 return False, f"Unsupported content type: {content_type}"
 
-            # 5. Check terms of service URL
-            tos_paths = ['/terms', '/tos', '/terms-of-service', '/terms-and-conditions']
-            for path in tos_paths:
-                tos_url = base_url + path
-                try:
-                    tos_response = requests.head(tos_url, headers=HEADERS, timeout=3)
-                    if tos_response.status_code == 200:
-                        return True, "Warning: Please review Terms of Service at " + tos_url
-                except:
-                    continue
-
-            return True, "All permission checks passed"
+            # 5. Check terms of service URL - first 200 wins; failed probes
+            # surface as None, so the common 404/timeout path costs no
+            # exception unwinding
+            for future in as_completed(tos_futures):
+                tos_response = future.result()
+                if tos_response is not None and tos_response.status_code == 200:
+                    tos_url = base_url + tos_futures[future]
+                    return True, "Warning: Please review Terms of Service at " + tos_url
 
-        except requests.exceptions.RequestException as e:
-            return False, f"Network error during permission check: {str(e)}"
+        return True, "All permission checks passed"
 
     except Exception as e:
         return False, f"Permission check error: {str(e)}"
 
-def check_robots_permission(url):
+# Cache parsed robots.txt per domain - robots files rarely change, so an
+# hour of reuse removes a GET plus a re-parse from every repeat scrape.
+# A cached value of None means "no usable robots.txt, assume allowed".
+ROBOTS_CACHE_TTL = 3600.0
+robots_cache = {}
+robots_cache_lock = threading.Lock()
+
+def check_robots_permission(url, parsed_url=None):
     """Check if scraping is allowed by robots.txt"""
     try:
-        parsed_url = urlparse(url)
+        if parsed_url is None:
+            parsed_url = urlparse(url)
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        robots_url = f"{base_url}/robots.txt"
-        
-        # Fetch robots.txt
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        
-        # Try to read robots.txt with timeout
-        try:
-            response = requests.get(robots_url, headers=HEADERS, timeout=5)
-            if response.status_code == 200:
-                rp.parse(response.text.splitlines())
-            else:
-                return True  # No robots.txt, assume allowed
-        except:
-            return True  # If robots.txt can't be fetched, assume allowed
-        
+        domain = parsed_url.netloc
+        now = time.monotonic()
+
+        # Serve from the per-domain cache while fresh
+        with robots_cache_lock:
+            cached = robots_cache.get(domain)
+        if cached is not None and cached[1] > now:
+            rp = cached[0]
+        else:
+            robots_url = f"{base_url}/robots.txt"
+            rp = None
+            try:
+                response = SESSION.get(robots_url, timeout=5)
+                if response.status_code == 200:
+                    rp = RobotFileParser()
+                    rp.set_url(robots_url)
+                    rp.parse(response.text.splitlines())
+            except:
+                pass  # If robots.txt can't be fetched, assume allowed
+            with robots_cache_lock:
+                robots_cache[domain] = (rp, now + ROBOTS_CACHE_TTL)
+
+        if rp is None:
+            return True  # No robots.txt, assume allowed
+
         # Check permission for our user agent
         return rp.can_fetch(USER_AGENT, url)
-    
+
     except Exception as e:
         print(f"Robots.txt check error: {str(e)}")
         return True  # Fail-safe: assume allowed if check fails
 
-def extract_text_from_url(url):
+# Common content IDs/classes tried first by the extraction waterfall,
+# combined into one query so the tree is walked once instead of ten times
+CONTENT_QUERY = (
+    '#content, #main-content, .content, .main-content, '
+    'article, main, [role="main"], .post-content, '
+    '.entry-content, .article-content'
+)
+
+def extract_main_content_lexbor(html):
+    """Extract candidate content blocks using the selectolax lexbor tree"""
+    tree = LexborHTMLParser(html)
+
+    # Remove unnecessary elements but keep main content
+    for node in tree.css('script, style, iframe, noscript'):
+        node.decompose()
+
+    # Try different methods to get content
+    main_content = []
+
+    # Method 1: Try to find content by common content IDs/classes
+    seen = set()
+    collected_len = 0
+    for node in tree.css(CONTENT_QUERY):
+        text = node.text(separator=' ', strip=True)
+        if text and text not in seen:  # Skip nested/duplicate matches
+            seen.add(text)
+            main_content.append(text)
+            collected_len += len(text)
+            if collected_len >= MAX_TEXT_CHARS:  # Excerpt budget reached
+                return main_content
+
+    # Methods 2-4: one pass over the candidate tags instead of three
+    # full-tree walks, bucketed by priority (semantic > p > div)
+    if not main_content:
+        semantic = []
+        paragraphs = []
+        divs = []
+        for node in tree.css('article, main, section, p, div'):
+            tag = node.tag
+            if tag in ('article', 'main', 'section'):
+                text = node.text(separator=' ', strip=True)
+                if text and len(text) > 100:  # Only include substantial content
+                    semantic.append(text)
+                    collected_len += len(text)
+                    if collected_len >= MAX_TEXT_CHARS:  # Semantic wins anyway
+                        return semantic
+            elif tag == 'p':
+                text = node.text(strip=True)
+                if text and len(text) > 50:  # Filter out short paragraphs
+                    paragraphs.append(text)
+            else:
+                divs.append(node)  # Text extracted only if divs end up used
+        main_content = semantic or paragraphs
+        if not main_content:
+            for node in divs:
+                text = node.text(strip=True)
+                if text and len(text) > 100:
+                    main_content.append(text)
+                    collected_len += len(text)
+                    if collected_len >= MAX_TEXT_CHARS:
+                        break
+
+    # If still no content, get all text as last resort
+    if not main_content and tree.body is not None:
+        text = tree.body.text(separator=' ').strip()
+        if text:
+            main_content.append(text)
+
+    return main_content
+
+def extract_main_content_soup(html):
+    """Fallback extraction via BeautifulSoup + lxml, strained to content tags"""
+    soup = BeautifulSoup(html, 'lxml', parse_only=CONTENT_STRAINER)
+
+    # Drop noscript/iframe nested inside kept content - the strainer
+    # materializes them as part of a matched tag's subtree, and their text
+    # would otherwise leak into the excerpt
+    for element in soup.find_all(['noscript', 'iframe']):
+        element.decompose()
+
+    # Try different methods to get content
+    main_content = []
+
+    # Method 1: Try to find content by common content IDs/classes
+    seen = set()
+    collected_len = 0
+    for element in soup.select(CONTENT_QUERY):
+        text = element.get_text(separator=' ', strip=True)
+        if text and text not in seen:  # Skip nested/duplicate matches
+            seen.add(text)
+            main_content.append(text)
+            collected_len += len(text)
+            if collected_len >= MAX_TEXT_CHARS:  # Excerpt budget reached
+                return main_content
+
+    # Methods 2-4: one pass over the candidate tags instead of three
+    # full-tree walks, bucketed by priority (semantic > p > div)
+    if not main_content:
+        semantic = []
+        paragraphs = []
+        divs = []
+        for element in soup.find_all(['article', 'main', 'section', 'p', 'div']):
+            name = element.name
+            if name in ('article', 'main', 'section'):
+                text = element.get_text(separator=' ', strip=True)
+                if text and len(text) > 100:  # Only include substantial content
+                    semantic.append(text)
+                    collected_len += len(text)
+                    if collected_len >= MAX_TEXT_CHARS:  # Semantic wins anyway
+                        return semantic
+            elif name == 'p':
+                text = element.get_text(strip=True)
+                if text and len(text) > 50:  # Filter out short paragraphs
+                    paragraphs.append(text)
+            else:
+                divs.append(element)  # Text extracted only if divs end up used
+        main_content = semantic or paragraphs
+        if not main_content:
+            for div in divs:
+                text = div.get_text(strip=True)
+                if text and len(text) > 100:
+                    main_content.append(text)
+                    collected_len += len(text)
+                    if collected_len >= MAX_TEXT_CHARS:
+                        break
+
+    # If still no content, get all text as last resort
+    if not main_content:
+        text = soup.get_text(separator=' ', strip=True)
+        if text:
+            main_content.append(text)
+
+    return main_content
+
+def extract_text_from_url(url, parsed_url=None):
     """Fetch website content and extract clean text"""
     try:
         # Check robots.txt permission
-        if not check_robots_permission(url):
+        if not check_robots_permission(url, parsed_url):
             return None, "Scraping disallowed by robots.txt"
         
-        # Fetch page content
-        response = requests.get(url, headers=HEADERS, timeout=15)
+        # Fetch page content - stream so oversized pages are capped before
+        # we pay to decode and parse them; 2MB is ample for a 12k excerpt.
+        # Status, rate-limit and content-type checks are done on this GET's
+        # headers directly, so the /scrape path never needs a HEAD probe
+        # (the standalone /check-permission endpoint keeps its HEAD checks).
+        response = SESSION.get(url, timeout=15, stream=True)
+
+        if 'X-RateLimit-Remaining' in response.headers:
+            if int(response.headers['X-RateLimit-Remaining']) <= 0:
+                response.close()
+                return None, "Rate limit exceeded"
+
+        if response.status_code == 403:
+            response.close()
+            return None, "Access forbidden"
+        elif response.status_code == 429:
+            response.close()
+            return None, "Too many requests"
         response.raise_for_status()
-        
+
         # Check content type
         content_type = response.headers.get('Content-Type', '').lower()
         if 'text/html' not in content_type:
+            response.close()
             return None, f"Unsupported content type: {content_type}"
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove unnecessary elements but keep main content
-        for element in soup.find_all(['script', 'style', 'iframe', 'noscript']):
-            element.decompose()
-        
-        # Try different methods to get content
-        main_content = []
-        
-        # Method 1: Try to find content by common content IDs/classes
-        content_selectors = [
-            '#content', '#main-content', '.content', '.main-content',
-            'article', 'main', '[role="main"]', '.post-content',
-            '.entry-content', '.article-content'
-        ]
-        
-        for selector in content_selectors:
-            content = soup.select(selector)
-            if content:
-                for element in content:
-                    text = element.get_text(separator=' ', strip=True)
-                    if text:
-                        main_content.append(text)
-        
-        # Method 2: If no content found, try semantic elements
-        if not main_content:
-            semantic_tags = soup.find_all(['article', 'main', 'section'])
-            for tag in semantic_tags:
-                text = tag.get_text(separator=' ', strip=True)
-                if text and len(text) > 100:  # Only include substantial content
-                    main_content.append(text)
-        
-        # Method 3: Look for paragraphs with substantial content
-        if not main_content:
-            paragraphs = soup.find_all('p')
-            for p in paragraphs:
-                text = p.get_text(strip=True)
-                if text and len(text) > 50:  # Filter out short paragraphs
-                    main_content.append(text)
-        
-        # Method 4: Last resort - get all divs with substantial text
-        if not main_content:
-            divs = soup.find_all('div')
-            for div in divs:
-                text = div.get_text(strip=True)
-                if text and len(text) > 100:
-                    main_content.append(text)
-        
-        # If still no content, get all text as last resort
-        if not main_content:
-            text = soup.get_text(separator=' ', strip=True)
-            if text:
-                main_content.append(text)
+
+        # Read at most MAX_HTML_BYTES of the body, then decode once
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(65536):
+            chunks.append(chunk)
+            total += len(chunk)
+            if total >= MAX_HTML_BYTES:
+                break
+        response.close()
+        encoding = response.encoding or 'utf-8'
+        html = b''.join(chunks).decode(encoding, errors='replace')
+
+        # Parse HTML with the fastest parser available
+        if HAS_SELECTOLAX:
+            main_content = extract_main_content_lexbor(html)
+        else:
+            main_content = extract_main_content_soup(html)
         
         # Combine and clean the text
         if main_content:
             text = ' '.join(main_content)
             # Clean the text
-            text = re.sub(r'\s+', ' ', text)  # Replace multiple spaces
-            text = re.sub(r'\n+', ' ', text)  # Replace newlines
+            text = WS_RE.sub(' ', text)  # Replace multiple spaces
+            text = NL_RE.sub(' ', text)  # Replace newlines
             text = text.strip()
             
             if len(text) > 100:  # Ensure we have substantial content
-                return text[:12000], None
+                return text[:MAX_TEXT_CHARS], None
         
         return None, "No substantial content found on page"
     
@@ -236,11 +444,11 @@ def extract_text_from_url(url):
     except Exception as e:
         return None, f"Processing error: {str(e)}"
 
-def extract_fields_with_gemini(website_text, url):
-    """Use Gemini to extract structured data from website text"""
-    prompt = f"""
+# Static prompt built once at import; per-call work is just the two
+# placeholder substitutions instead of rebuilding the whole schema spec
+GEMINI_PROMPT_TEMPLATE = """
     Extract the following details from the website content below. Return ONLY valid JSON format:
-    
+
     Required Fields:
     - name: (string) Official company name
     - slug: (string) URL-friendly version of the company name
@@ -264,12 +472,12 @@ def extract_fields_with_gemini(website_text, url):
     - awards: (string) Any awards or recognitions received, required if entity_type is 'social_enterprise'
     - grants: (string) Any grants received, required if entity_type is 'social_enterprise'
     - institutional_support: (string) Any institutional support received, required if entity_type is 'social_enterprise'
-    
+
     Important:
     - Use "Unknown" for missing information
     - Keep description concise (1-2 sentences)
     - For website, use "{url}" if not found in content
-    
+
     Example Output:
     {{
         "name": "Tech Innovations Inc.",
@@ -295,18 +503,44 @@ def extract_fields_with_gemini(website_text, url):
         "grants": "Received $500,000 grant from TechFund",
         "institutional_support": "Supported by AI Research Institute"
     }}
-    
+
     Website Content:
-    {website_text}
+    {text}
     """
+
+# Cache Gemini extractions by content hash - the LLM call dominates
+# /scrape latency, and re-scrapes of unchanged pages can skip it entirely
+GEMINI_CACHE_TTL = 86400.0
+gemini_cache = {}
+gemini_cache_lock = threading.Lock()
+
+def extract_fields_with_gemini(website_text, url):
+    """Use Gemini to extract structured data from website text"""
+    # Serve a cached extraction if this exact content was seen recently
+    cache_key = hashlib.blake2b(website_text.encode(), digest_size=16).hexdigest()
+    now = time.monotonic()
+    with gemini_cache_lock:
+        cached = gemini_cache.get(cache_key)
+    if cached is not None and cached[1] > now:
+        return dict(cached[0]), None  # Copy so callers can't mutate the cache
+
+    prompt = GEMINI_PROMPT_TEMPLATE.format(url=url, text=website_text)
     
     try:
         response = model.generate_content(prompt)
-        # Extract JSON from response
-        json_match = re.search(r'\{[\s\S]*\}', response.text)
-        if json_match:
-            return json_match.group(0), None
-        return None, "No valid JSON found in AI response"
+        # Parse the first JSON object in the response; raw_decode stops at
+        # the end of the object instead of regex-scanning the whole text
+        response_text = response.text
+        start = response_text.find('{')
+        if start == -1:
+            return None, "No valid JSON found in AI response"
+        try:
+            extracted, _ = JSON_DECODER.raw_decode(response_text, start)
+        except json.JSONDecodeError:
+            return None, "No valid JSON found in AI response"
+        with gemini_cache_lock:
+            gemini_cache[cache_key] = (extracted, now + GEMINI_CACHE_TTL)
+        return dict(extracted), None
     except Exception as e:
         return None, f"Gemini processing error: {str(e)}"
 
@@ -317,19 +551,18 @@ def clean_contact_info(contact_info):
     
     try:
         # Check for email addresses
-        email_pattern = r'[\w\.-]+@[\w\.-]+\.\w+'
-        emails = re.findall(email_pattern, contact_info)
-        
+        emails = EMAIL_RE.findall(contact_info)
+
         if not emails:
             # No emails found, just clean basic formatting
             contact_info = contact_info.replace('\\n', ' ')
-            contact_info = re.sub(r'\s+', ' ', contact_info)
+            contact_info = WS_RE.sub(' ', contact_info)
             return contact_info.strip()
-        
+
         # If emails exist, preserve them while cleaning
         # Clean the text
         contact_info = contact_info.replace('\\n', ' ')
-        contact_info = re.sub(r'\s+', ' ', contact_info)
+        contact_info = WS_RE.sub(' ', contact_info)
         
         # Replace any sanitized email addresses with original ones
         for email in emails:
@@ -344,6 +577,34 @@ def clean_contact_info(contact_info):
         print(f"Error cleaning contact info: {str(e)}")
         return contact_info  # Return original if cleaning fails
 
+# Background sweeper so a long-running process doesn't accumulate state
+# for domains and pages it will never see again
+SWEEP_INTERVAL = 300.0
+BUCKET_IDLE_TTL = 1800.0  # Drop rate-limit buckets idle for 2x+ the window
+
+def sweep_caches():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        now = time.monotonic()
+        cutoff = now - BUCKET_IDLE_TTL
+        with rate_limit_lock:
+            stale = [domain for domain, (_, last_refill) in rate_limit_buckets.items()
+                     if last_refill < cutoff]
+            for domain in stale:
+                del rate_limit_buckets[domain]
+        with robots_cache_lock:
+            stale = [domain for domain, (_, expiry) in robots_cache.items()
+                     if expiry <= now]
+            for domain in stale:
+                del robots_cache[domain]
+        with gemini_cache_lock:
+            stale = [key for key, (_, expiry) in gemini_cache.items()
+                     if expiry <= now]
+            for key in stale:
+                del gemini_cache[key]
+
+threading.Thread(target=sweep_caches, daemon=True).start()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for monitoring"""
@@ -366,16 +627,16 @@ def scrape_website():
         url = data['url'].strip()
         if not url:
             raise ValueError("Empty URL provided")
-            
+
+        # Parse the URL once and thread the result through the helpers
+        parsed_url = urlparse(url)
+
         # Rate limiting check
-        if not check_rate_limit(url):
-            raise Exception("Rate limit exceeded for this domain")            
-    
-        # Check if URL already exists in database
-        existing_record = supabase.table('entities').select('id').eq('website', url).execute()
-        
+        if not check_rate_limit(parsed_url.netloc):
+            raise Exception("Rate limit exceeded for this domain")
+
         # Step 1: Extract website text
-        website_text, error = extract_text_from_url(url)
+        website_text, error = extract_text_from_url(url, parsed_url)
         
         if error:
             raise ValueError(str(error))
@@ -386,52 +647,46 @@ def scrape_website():
             #     "execution_time": round(time.time() - start_time, 2)
             # }), 403 if "robots.txt" in error else 500
         
-        # Step 2: Extract fields with Gemini
-        gemini_response, error = extract_fields_with_gemini(website_text, url)
-        
+        # Step 2: Extract fields with Gemini (already parsed to a dict)
+        extracted_data, error = extract_fields_with_gemini(website_text, url)
+
         if error:
-            raise Exception(str(error))  
+            raise Exception(str(error))
             # return jsonify({
             #     "status": "error",
             #     "message": error,
             #     "url": url,
             #     "execution_time": round(time.time() - start_time, 2)
             # }), 500
-        
-        # Parse and validate Gemini response
-        extracted_data = json.loads(gemini_response)
-        
+
         # Clean contact info
         extracted_data['contact_email'] = clean_contact_info(extracted_data.get('contact_email'))
         
         # Add metadata
         extracted_data['updated_at'] = 'now()'
         extracted_data['website'] = url
-        
-        if existing_record.data and len(existing_record.data) > 0:
-            # Update existing record
-            record_id = existing_record.data[0]['id']
-            result = supabase.table('entities').update(extracted_data).eq('id', record_id).execute()
-            operation = "updated"
-        else:
-            # Insert new record
-            extracted_data['created_at'] = 'now()'
-            result = supabase.table('entities').insert(extracted_data).execute()
-            operation = "created"
-            
+
+        # Upsert on the unique website column - one round trip instead of
+        # a select followed by insert/update, and no race where two
+        # concurrent scrapes of a new URL both insert. created_at comes
+        # from the schema default on first insert.
+        result = supabase.table('entities').upsert(
+            extracted_data, on_conflict='website'
+        ).execute()
+
         if len(result.data) > 0:
             # Prepare API response
             response_data = extracted_data.copy()
             response_data['id'] = result.data[0]['id']
-            
+
             return jsonify({
                 "status": "success",
-                "message": f"Data {operation} successfully",
+                "message": "Data saved successfully",
                 "data": response_data,
                 "execution_time": round(time.time() - start_time, 2)
             })
         else:
-            raise Exception(f"Failed to {operation} data in Supabase")
+            raise Exception("Failed to save data in Supabase")
     except ValueError as e:
         return jsonify({
             "status": "error",
@@ -466,16 +721,28 @@ def check_permission():
     })
 
 if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
     # Production configurations
     if os.getenv('FLASK_ENV') == 'production':
-        from waitress import serve
+        # Hand off to gunicorn with gevent workers - every request here is
+        # dominated by seconds of blocking network IO (probes, robots, the
+        # Gemini call), so green threads scale far better than a small
+        # fixed thread pool
         app.logger.info('Starting production server...')
-        serve(app, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
+        os.execvp('gunicorn', [
+            'gunicorn',
+            '-k', 'gevent',
+            '-w', str(os.cpu_count() or 2),
+            '--worker-connections', '1000',
+            '--timeout', '120',
+            '-b', f'0.0.0.0:{port}',
+            'app:app'
+        ])
     else:
         # Development configurations
         app.logger.info('Starting development server...')
         app.run(
             host='0.0.0.0',
-            port=int(os.getenv('PORT', 5000)),
+            port=port,
             debug=True
         )
\ No newline at end of file